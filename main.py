@@ -2,17 +2,26 @@ import asyncio
 import logging
 import sys
 
-from aiogram import Bot, Dispatcher
-from aiogram.types import BotCommand
-from aiogram.fsm.storage.memory import MemoryStorage
-
-from src.config import settings
-from src.database.engine import init_db, close_db
-from src.bot.handlers import main_router
-from src.bot.inline import inline_router
-from src.bot.middlewares import DbSessionMiddleware
+# Upper bound on updates processed concurrently by the dispatcher
+MAX_CONCURRENT_UPDATES = 500
 
 async def main():
+    # OPTIMIZATION: The bot stack is imported here, not at module level. CHART_POOL workers are
+    # spawned processes that re-import this file as __mp_main__ just to render PNGs; with
+    # top-level imports each of them also loaded aiogram, SQLAlchemy, OCR and the handlers.
+    from aiogram import Bot, Dispatcher
+    from aiogram.types import BotCommand
+    from aiogram.fsm.storage.memory import MemoryStorage
+
+    from src.config import get_settings
+    from src.database.engine import init_db, close_db
+    from src.bot.handlers import main_router
+    from src.bot.inline import inline_router
+    from src.bot.middlewares import DbSessionMiddleware
+    from src.services.charts import CHART_POOL, chart_warmer
+    from src.services.ocr import OCR_POOL, warm_up_ocr
+    from src.services.rates import RATES_POOL, rates_service
+
     # Configure logging
     logging.basicConfig(level=logging.INFO, stream=sys.stdout)
     logger = logging.getLogger(__name__)
@@ -24,7 +33,7 @@ async def main():
     logger.info("Database initialized.")
 
     # Initialize Bot and Dispatcher
-    bot = Bot(token=settings.BOT_TOKEN.get_secret_value())
+    bot = Bot(token=get_settings().BOT_TOKEN.get_secret_value())
     dp = Dispatcher(storage=MemoryStorage())
 
     # Setup menu commands
@@ -34,15 +43,45 @@ async def main():
         BotCommand(command="chart", description="Get currency chart"),
     ])
 
-    dp.update.middleware(DbSessionMiddleware())
+    # Inner middleware: runs after routing, so only handlers that need a DB session get one
+    db_session_middleware = DbSessionMiddleware()
+    dp.message.middleware(db_session_middleware)
+    dp.callback_query.middleware(db_session_middleware)
     dp.include_router(main_router)
     dp.include_router(inline_router)
 
+    # Keep popular /chart pairs pre-rendered so users don't wait for Yahoo + rendering
+    warmer_task = asyncio.create_task(chart_warmer())
+    # Renew exchange rates before they expire instead of on the first message after expiry
+    rates_task = asyncio.create_task(rates_service.refresh_loop())
+    # Load the OCR models in the background, ahead of the first photo. This occupies one
+    # OCR_POOL worker; that is enough, since tesseract runs as a subprocess and the traineddata
+    # it reads stays in the OS page cache for every worker.
+    warm_up_future = asyncio.get_running_loop().run_in_executor(OCR_POOL, warm_up_ocr)
+
+    def _log_warm_up_failure(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("OCR warm-up crashed", exc_info=future.exception())
+
+    warm_up_future.add_done_callback(_log_warm_up_failure)
+
     try:
-        await dp.start_polling(bot)
+        # Each update is handled in its own retained task, so a slow OCR/chart handler in one chat
+        # doesn't block polling for the others. The limit caps in-flight handlers under bursts.
+        await dp.start_polling(
+            bot,
+            handle_as_tasks=True,
+            tasks_concurrency_limit=MAX_CONCURRENT_UPDATES,
+        )
     finally:
         logger.info("Shutting down...")
+        warmer_task.cancel()
+        rates_task.cancel()
         await close_db()
+        CHART_POOL.shutdown(wait=False, cancel_futures=True)
+        OCR_POOL.shutdown(wait=False, cancel_futures=True)
+        RATES_POOL.shutdown(wait=False, cancel_futures=True)
+        rates_service.close()
         await bot.session.close()
         logger.info("Shutdown complete.")
 
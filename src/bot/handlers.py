@@ -5,23 +5,21 @@ from typing import List, Optional
 
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, BufferedInputFile, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command, CommandStart, CommandObject
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.services.recognizer import recognize, Price
 from src.services.rates import rates_service
-from src.services.charts import generate_chart
-from src.services.ocr import image_to_text
-from src.database.dal import get_chat_settings, toggle_currency, get_target_currencies
-from src.bot.keyboards import settings_keyboard, CURRENCY_FLAGS
+from src.services.charts import generate_chart_async
+from src.services.ocr import image_to_text, OCR_POOL
+from src.database.dal import toggle_currency, get_target_currencies
+from src.bot.keyboards import settings_keyboard, format_converted_amount, CURRENCY_FLAGS, DEFAULT_FLAG
 
 logger = logging.getLogger(__name__)
 
 main_router = Router()
 
-def get_flag(currency: str) -> str:
-    return CURRENCY_FLAGS.get(currency, "💰")
-
 async def convert_prices(prices: List[Price], session: AsyncSession, chat_id: int) -> Optional[str]:
     """
     Converts a list of recognized prices to the target currencies defined in chat settings.
@@ -30,43 +28,65 @@ async def convert_prices(prices: List[Price], session: AsyncSession, chat_id: in
     # Fetch settings via get_target_currencies, which uses an in-memory cache to avoid hitting
     # the database on this high-frequency path (per-message conversions). This significantly
     # reduces repeated chat-settings queries and improves end-to-end latency under load.
-    target_currencies = await get_target_currencies(session, chat_id)
+    # OPTIMIZATION: Fetch rates once to avoid repeated async calls and lock acquisition overhead
+    # in the loop below. Both lookups are independent, so they are gathered concurrently:
+    # on a cold cache the DB query and the rates refresh overlap instead of running back to back.
+    target_currencies, rates = await asyncio.gather(
+        get_target_currencies(session, chat_id),
+        rates_service.get_rates(),
+    )
 
     if not target_currencies:
          return None
 
-    # OPTIMIZATION: Fetch rates once to avoid repeated async calls and lock acquisition overhead
-    # in the loop below. This reduces context switching.
-    rates = await rates_service.get_rates()
     if not rates:
         return None
 
     response_lines = []
+    # OPTIMIZATION: Conversion factors per source currency, resolved once per message.
+    # Several prices in the same currency reuse the row instead of re-deriving each pair.
+    factors_by_source = {}
+    # OPTIMIZATION: Local alias for the flag lookup used in the loops below
+    # (skips the global dict lookup per line).
+    flag_of = CURRENCY_FLAGS.get
+
+    # OPTIMIZATION: Rendered blocks per (amount, currency). A message listing the same price
+    # several times converts it once and repeats the block in the original order.
+    blocks_by_price = {}
 
     for price in prices:
-        flag = get_flag(price.currency)
+        price_key = (price.amount, price.currency)
+        block = blocks_by_price.get(price_key)
 
-        # Header: 🇺🇸 100 USD
-        response_lines.append(f"{flag} {price.amount:g} {price.currency}")
+        if block is None:
+            flag = flag_of(price.currency, DEFAULT_FLAG)
 
-        conversions = []
-        for target_code in target_currencies:
-            if target_code == price.currency:
-                continue
+            # Header: 🇺🇸 100 USD
+            block = [f"{flag} {price.amount:g} {price.currency}"]
 
-            target_flag = get_flag(target_code)
-            # Use synchronous calculation with pre-fetched rates
-            converted_amount = rates_service.calculate_conversion(
-                price.amount, price.currency, target_code, rates
-            )
+            factors = factors_by_source.get(price.currency)
+            if factors is None:
+                # The source currency is excluded once here, so the row holds only real targets
+                # (in settings order) and the line builder below needs no per-target skip check.
+                effective_targets = [t for t in target_currencies if t != price.currency]
+                factors = rates_service.get_conversion_factors(price.currency, effective_targets, rates)
+                factors_by_source[price.currency] = factors
 
-            formatted_amount = f"{converted_amount:.2f}".rstrip("0").rstrip(".")
-            # Indented line: "  🇷🇺 9000 RUB"
-            conversions.append(f"  {target_flag} {formatted_amount} {target_code}")
+            # OPTIMIZATION: Build the indented lines ("  🇷🇺 9000 RUB") in one comprehension
+            # (pure multiplication with pre-fetched rates) and extend once, instead of
+            # appending to a temporary list per target.
+            conversions = [
+                f"  {flag_of(target_code, DEFAULT_FLAG)} {format_converted_amount(price.amount, factor)} {target_code}"
+                for target_code, factor in factors.items()
+            ]
 
-        if conversions:
-            response_lines.extend(conversions)
-            response_lines.append("")  # Empty line between different source amounts
+            if conversions:
+                block += conversions
+                block.append("")  # Empty line between different source amounts
+
+            blocks_by_price[price_key] = block
+
+        response_lines += block
 
     return "\n".join(response_lines).strip() if response_lines else None
 
@@ -159,22 +179,15 @@ async def cmd_chart(message: Message, command: CommandObject):
     status_msg = await message.answer(f"⏳ Получаю данные и строю график {currency}/RUB...")
     await message.bot.send_chat_action(chat_id=message.chat.id, action="upload_photo")
 
-    # Run synchronous chart generation in a thread or executor if needed,
-    # but for simplicity calling direct here (it blocks, but short time).
-    # Ideally should use run_in_executor.
-    loop = asyncio.get_running_loop()
-
     try:
-        # Run yfinance/matplotlib in executor to avoid blocking event loop
+        # Chart rendering runs in a dedicated process pool (see charts.CHART_POOL)
         # Add timeout to prevent hanging
-        buf = await asyncio.wait_for(
-            loop.run_in_executor(None, generate_chart, ticker),
-            timeout=30.0
-        )
+        image_bytes = await asyncio.wait_for(generate_chart_async(ticker), timeout=30.0)
 
-        if buf:
+        if image_bytes:
             await status_msg.delete()
-            photo = BufferedInputFile(buf.read(), filename=f"chart_{currency}.png")
+            # Cached PNG bytes go straight to the upload, no BytesIO round-trip
+            photo = BufferedInputFile(image_bytes, filename=f"chart_{currency}.png")
             await message.reply_photo(photo, caption=f"График {currency}/RUB за месяц")
         else:
             await status_msg.edit_text("Не удалось получить данные для графика. Возможно, тикер не найден.")
@@ -189,8 +202,9 @@ async def on_toggle_currency(callback: CallbackQuery, session: AsyncSession):
     currency = callback.data.split("_")[1]
 
     # UX Improvement: Prevent disabling the last currency to avoid "broken" state
-    settings = await get_chat_settings(session, callback.message.chat.id)
-    current_currencies = settings.target_currencies
+    # OPTIMIZATION: Read through the settings cache; toggle_currency refreshes it after the write,
+    # so the check doesn't need its own SELECT on every button press.
+    current_currencies = await get_target_currencies(session, callback.message.chat.id)
 
     if currency in current_currencies and len(current_currencies) == 1:
         await callback.answer("⚠️ Нельзя отключить последнюю валюту!", show_alert=True)
@@ -200,9 +214,12 @@ async def on_toggle_currency(callback: CallbackQuery, session: AsyncSession):
 
     keyboard = settings_keyboard(callback.message.chat.id, new_currencies)
 
-    # Check if message text or markup is different to avoid API error if nothing changed?
-    # Actually toggle always changes state.
-    await callback.message.edit_reply_markup(reply_markup=keyboard)
+    try:
+        await callback.message.edit_reply_markup(reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # Racing double-clicks can leave the message already showing this markup
+        if "message is not modified" not in str(e):
+            raise
     await callback.answer(f"{currency} переключен")
 
 @main_router.callback_query(F.data == "close_settings")
@@ -262,11 +279,11 @@ async def handle_photo(message: Message, session: AsyncSession):
         # This saves memory (approx 1x image size) and CPU.
         file_io.seek(0)
 
-        # Run OCR in executor with timeout
+        # Run OCR in its dedicated executor with timeout
         loop = asyncio.get_running_loop()
         try:
             text = await asyncio.wait_for(
-                loop.run_in_executor(None, image_to_text, file_io),
+                loop.run_in_executor(OCR_POOL, image_to_text, file_io),
                 timeout=30.0
             )
         except asyncio.TimeoutError:
@@ -274,6 +291,10 @@ async def handle_photo(message: Message, session: AsyncSession):
                 await status_msg.edit_text("⏱️ Превышено время распознавания текста")
             return
 
+        # OCR has consumed the image: release the download buffer (up to 20MB) now
+        # instead of holding it through rate lookups and Telegram replies.
+        file_io.close()
+
         if not text:
             if is_private and status_msg:
                 await status_msg.edit_text("Не удалось распознать текст.")
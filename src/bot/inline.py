@@ -1,56 +1,55 @@
+import asyncio
 import hashlib
+from functools import lru_cache
+from typing import Tuple
+
 from aiogram import Router
 from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
 
-from src.services.recognizer import recognize
+from src.services.recognizer import recognize, Price
 from src.services.rates import rates_service
-from src.bot.keyboards import CURRENCY_FLAGS
-
-def get_flag(currency: str) -> str:
-    return CURRENCY_FLAGS.get(currency, "💰")
-
-inline_router = Router()
+from src.bot.keyboards import CURRENCY_FLAGS, DEFAULT_FLAG, format_converted_amount
 
-@inline_router.inline_query()
-async def inline_query_handler(inline_query: InlineQuery):
-    text = inline_query.query.strip()
-    if not text:
-        return
+# Default targets for inline mode
+INLINE_TARGETS = ("RUB", "USD", "EUR")
 
-    prices = recognize(text)
-    if not prices:
-        return
+# How long an inline query waits for rates (Telegram drops late inline answers)
+INLINE_RATES_TIMEOUT = 4.0
 
-    # OPTIMIZATION: Fetch rates once for batch processing
-    rates = await rates_service.get_rates()
-    if not rates:
-        return
+inline_router = Router()
 
+@lru_cache(maxsize=1024)
+def build_inline_results(prices: Tuple[Price, ...], rates_epoch: float) -> Tuple[InlineQueryResultArticle, ...]:
+    """
+    Builds inline results for the recognized prices using the rates currently held by rates_service.
+    OPTIMIZATION: Memoized on (prices, rates_epoch) so repeated queries (burst typing, popular
+    amounts like "100 usd") skip conversion and hashing. Price is frozen, so the tuple is hashable.
+    `rates_epoch` is rates_service.last_updated, so a rates refresh naturally invalidates old entries.
+    """
+    rates = rates_service.rates
     results = []
-    # Default targets for inline mode
-    targets = ["RUB", "USD", "EUR"]
+    # OPTIMIZATION: Local alias for the flag lookup used in the loops below
+    flag_of = CURRENCY_FLAGS.get
 
     for price in prices:
-        for target in targets:
-            # Skip if converting to itself
-            if price.currency == target:
-                continue
+        # Skip converting to itself: the source is excluded from the factor row up front
+        targets = [t for t in INLINE_TARGETS if t != price.currency]
+        factors = rates_service.get_conversion_factors(price.currency, targets, rates)
+        src_flag = flag_of(price.currency, DEFAULT_FLAG)
 
-            converted_amount = rates_service.calculate_conversion(
-                price.amount, price.currency, target, rates
-            )
-            if converted_amount == 0.0:
+        for target, factor in factors.items():
+            if price.amount * factor == 0.0:
                 continue
 
-            formatted_val = f"{converted_amount:.2f}".rstrip("0").rstrip(".")
+            formatted_val = format_converted_amount(price.amount, factor)
 
-            src_flag = get_flag(price.currency)
-            target_flag = get_flag(target)
+            target_flag = flag_of(target, DEFAULT_FLAG)
 
             result_text = f"{src_flag} {price.amount:g} {price.currency} ≈ {target_flag} {formatted_val} {target}"
 
-            # Unique ID for the result
-            result_id = hashlib.md5(result_text.encode()).hexdigest()
+            # Unique ID for the result. Needs no cryptographic strength: a 64-bit BLAKE2b
+            # digest gives a 16-char id (Telegram allows up to 64 bytes) from the stdlib.
+            result_id = hashlib.blake2b(result_text.encode(), digest_size=8).hexdigest()
 
             article = InlineQueryResultArticle(
                 id=result_id,
@@ -62,8 +61,37 @@ async def inline_query_handler(inline_query: InlineQuery):
             )
             results.append(article)
 
+    return tuple(results)
+
+@inline_router.inline_query()
+async def inline_query_handler(inline_query: InlineQuery):
+    text = inline_query.query.strip()
+    if not text:
+        return
+
+    # Parsed once here; build_inline_results works on the prices, not the raw text
+    prices = tuple(recognize(text))
+    if not prices:
+        return
+
+    # OPTIMIZATION: Fetch rates once for batch processing.
+    # On a cold cache the refresh can take up to RatesService.FETCH_TIMEOUT, far beyond the inline
+    # answer window. Stop waiting after INLINE_RATES_TIMEOUT; shield() lets the refresh finish
+    # in the background so the next keystroke is served from cache.
+    try:
+        rates = await asyncio.wait_for(
+            asyncio.shield(rates_service.get_rates()),
+            timeout=INLINE_RATES_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        return
+    if not rates:
+        return
+
+    results = build_inline_results(prices, rates_service.last_updated)
+
     # answer with cache_time=1 to ensure freshness if rates change fast,
     # though our rates cache is 1h. 300s is reasonable default for inline queries.
     # But prompt implies "results of conversion", maybe rates update.
     # Let's use 60s.
-    await inline_query.answer(results, cache_time=60)
+    await inline_query.answer(list(results), cache_time=60)
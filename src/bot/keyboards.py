@@ -1,3 +1,4 @@
+from functools import lru_cache
 from typing import Sequence
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
@@ -17,32 +18,55 @@ CURRENCY_FLAGS = {
     "TRY": "🇹🇷",  # Included for completeness if added to supported list
 }
 
-def get_currency_label(currency: str) -> str:
-    """Returns the currency code prefixed with its flag/icon."""
-    flag = CURRENCY_FLAGS.get(currency, "💰")
-    return f"{flag} {currency}"
+# Icon for currencies without a dedicated flag
+DEFAULT_FLAG = "💰"
 
-def settings_keyboard(chat_id: int, current_currencies: Sequence[str]) -> InlineKeyboardMarkup:
-    # Supported currencies to toggle
-    SUPPORTED_CURRENCIES = list(CURRENCY_FLAGS.keys())
+# Precomputed "flag code" labels for all known currencies
+_CURRENCY_LABELS = {currency: f"{flag} {currency}" for currency, flag in CURRENCY_FLAGS.items()}
 
-    builder = InlineKeyboardBuilder()
+@lru_cache(maxsize=4096)
+def format_converted_amount(amount: float, factor: float) -> str:
+    """
+    Returns `amount * factor` rounded to 2 decimals without trailing zeros (e.g. "9000", "1.5").
+    OPTIMIZATION: Memoized on (amount, factor). The factor changes whenever rates are refreshed,
+    so repeated prices in busy chats reuse the formatted string until the next rates update.
+    """
+    value = amount * factor
+    # Fast path: whole numbers (common for RUB/JPY outputs) skip the format-then-strip round trip
+    if value.is_integer():
+        return str(int(value))
+    return f"{value:.2f}".rstrip("0").rstrip(".")
 
-    for currency in SUPPORTED_CURRENCIES:
-        is_active = currency in current_currencies
-        # Get flag + code
-        label = get_currency_label(currency)
+# Supported currencies to toggle, in keyboard order
+SUPPORTED_CURRENCIES = tuple(CURRENCY_FLAGS.keys())
+
+# Static "close" button shared by every settings keyboard
+_CLOSE_BUTTON = InlineKeyboardButton(text="Закрыть", callback_data="close_settings")
 
-        # Add checkmark/cross
-        status_icon = "✅" if is_active else "❌"
-        text = f"{status_icon} {label}"
+# Bit position of each supported currency in the active-selection mask
+_CURRENCY_BITS = {currency: 1 << i for i, currency in enumerate(SUPPORTED_CURRENCIES)}
 
-        callback_data = f"toggle_{currency}"
+# OPTIMIZATION: The markup depends only on which supported currencies are active, so it is built
+# once per distinct selection, keyed by a bitmask. Codes without a button don't affect the key,
+# which keeps the cache strictly bounded by 2 ** len(SUPPORTED_CURRENCIES) entries.
+@lru_cache(maxsize=None)
+def _build_settings_markup(active_mask: int) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
 
-        builder.button(text=text, callback_data=callback_data)
+    for currency in SUPPORTED_CURRENCIES:
+        # Checkmark/cross + precomputed flag and code
+        status_icon = "✅" if active_mask & _CURRENCY_BITS[currency] else "❌"
+        builder.button(text=f"{status_icon} {_CURRENCY_LABELS[currency]}", callback_data=f"toggle_{currency}")
 
     builder.adjust(2) # 2 columns
 
-    builder.row(InlineKeyboardButton(text="Закрыть", callback_data="close_settings"))
+    builder.row(_CLOSE_BUTTON)
 
     return builder.as_markup()
+
+def settings_keyboard(chat_id: int, current_currencies: Sequence[str]) -> InlineKeyboardMarkup:
+    # chat_id doesn't affect the layout, so it isn't part of the cache key
+    active_mask = 0
+    for currency in current_currencies:
+        active_mask |= _CURRENCY_BITS.get(currency, 0)
+    return _build_settings_markup(active_mask)
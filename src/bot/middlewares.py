@@ -5,12 +5,22 @@ from aiogram.types import TelegramObject
 from src.database.engine import async_session
 
 class DbSessionMiddleware(BaseMiddleware):
+    """
+    Provides an AsyncSession as the `session` handler argument.
+    OPTIMIZATION: Registered as an inner (per-handler) middleware, so the matched handler is known:
+    handlers that don't take `session` (/start, /chart, inline queries, buttons served from
+    cache) skip opening and closing a session entirely.
+    """
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
+        handler_object = data.get("handler")
+        if handler_object is not None and "session" not in handler_object.params:
+            return await handler(event, data)
+
         async with async_session() as session:
             data["session"] = session
             return await handler(event, data)
@@ -1,6 +1,7 @@
 from typing import List, Dict, Tuple, Sequence
 import time
-from sqlalchemy import select
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import ChatSettings
@@ -11,24 +12,51 @@ DEFAULT_CURRENCIES = ["USD", "EUR", "RUB"]
 _settings_cache: Dict[int, Tuple[float, Sequence[str]]] = {}
 _CACHE_TTL = 300  # 5 minutes
 
+# OPTIMIZATION: Hot statements are built once at import time with bind parameters,
+# instead of constructing a new Select/Update object on every call.
+# (UPDATE reserves column names as bind names, hence the b_ prefix.)
+_SELECT_SETTINGS = select(ChatSettings).where(ChatSettings.chat_id == bindparam("b_chat_id"))
+_UPDATE_TARGETS = (
+    update(ChatSettings)
+    .where(ChatSettings.chat_id == bindparam("b_chat_id"))
+    .values(target_currencies=bindparam("b_targets", type_=ChatSettings.target_currencies.type))
+)
+
 async def get_chat_settings(session: AsyncSession, chat_id: int) -> ChatSettings:
     """
     Retrieves chat settings for the given chat_id.
     If settings do not exist, creates them with defaults.
     """
-    stmt = select(ChatSettings).where(ChatSettings.chat_id == chat_id)
-    result = await session.execute(stmt)
+    params = {"b_chat_id": chat_id}
+    result = await session.execute(_SELECT_SETTINGS, params)
     settings = result.scalar_one_or_none()
 
     if settings is None:
-        settings = ChatSettings(
-            chat_id=chat_id,
-            target_currencies=list(DEFAULT_CURRENCIES), # Copy
-            default_source="USD"
+        # OPTIMIZATION: Insert-or-get in one statement. RETURNING hands back the new row
+        # (no add + refresh round-trips), and ON CONFLICT DO NOTHING makes concurrent first
+        # messages from the same chat safe instead of failing on the unique chat_id.
+        insert_stmt = (
+            sqlite_insert(ChatSettings)
+            .values(
+                chat_id=chat_id,
+                target_currencies=list(DEFAULT_CURRENCIES), # Copy
+                default_source="USD"
+            )
+            .on_conflict_do_nothing(index_elements=[ChatSettings.chat_id])
+            .returning(ChatSettings)
         )
-        session.add(settings)
+        result = await session.execute(insert_stmt)
+        settings = result.scalar_one_or_none()
         await session.commit()
-        await session.refresh(settings)
+
+        if settings is None:
+            # Another update created the row between our SELECT and INSERT
+            result = await session.execute(_SELECT_SETTINGS, params)
+            settings = result.scalar_one()
+
+    # Read-through: every DB read refreshes the settings cache, so a following
+    # get_target_currencies for this chat is served from memory.
+    _settings_cache[chat_id] = (time.time(), tuple(settings.target_currencies))
 
     return settings
 
@@ -56,25 +84,22 @@ async def toggle_currency(session: AsyncSession, chat_id: int, currency_code: st
     Toggles a currency in the target_currencies list for the given chat_id.
     Returns the updated list of currencies.
     """
-    settings = await get_chat_settings(session, chat_id)
-
-    # Ensure it's a list (JSON type can sometimes be weird if DB is messed up, but should be fine)
-    current_list = list(settings.target_currencies)
+    # OPTIMIZATION: Read the current list through the settings cache (which also creates the row
+    # on first use) and write the new list with a single UPDATE, instead of
+    # SELECT + UPDATE + refresh SELECT for every button press.
+    current_list = list(await get_target_currencies(session, chat_id))
 
     if currency_code in current_list:
         current_list.remove(currency_code)
     else:
         current_list.append(currency_code)
 
-    settings.target_currencies = current_list
-    # For some JSON implementations in SQLAlchemy, mutation might not track automatically
-    # unless we reassign or flag modified. Reassigning is safe.
-    # Also need to add to session to be sure (it is attached though).
-
+    await session.execute(
+        _UPDATE_TARGETS, {"b_chat_id": chat_id, "b_targets": current_list}
+    )
     await session.commit()
-    await session.refresh(settings)
 
     # Update cache
-    _settings_cache[chat_id] = (time.time(), tuple(settings.target_currencies))
+    _settings_cache[chat_id] = (time.time(), tuple(current_list))
 
-    return settings.target_currencies
+    return current_list
@@ -1,17 +1,45 @@
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from src.config import settings
+from src.config import get_settings
 from src.database.models import Base
 
 # Create async engine for SQLite
 # check_same_thread=False is needed for SQLite with asyncio
-DATABASE_URL = f"sqlite+aiosqlite:///{settings.DB_PATH}"
+DATABASE_URL = f"sqlite+aiosqlite:///{get_settings().DB_PATH}"
+
+# Connection pool sizing. Every DB-backed update checks out a connection via DbSessionMiddleware,
+# so the default of 5 pooled connections makes concurrent updates wait on each other
+# (or open throwaway overflow connections) under chat load.
+POOL_SIZE = 20
+MAX_OVERFLOW = 10
 
 engine = create_async_engine(
     DATABASE_URL,
     echo=False,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
     connect_args={"check_same_thread": False}
 )
 
+# SQLite tuning applied to every new pooled connection:
+# - WAL lets readers proceed during a write and turns commits into appends
+# - synchronous=NORMAL is durable in WAL mode and skips an fsync per commit
+# - temp tables, memory-mapped I/O and a larger page cache keep hot reads in memory
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",  # 256MB
+    "PRAGMA cache_size=-20000",  # ~20MB
+)
+
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
 # Session factory
 async_session = async_sessionmaker(
     engine,
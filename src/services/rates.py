@@ -1,30 +1,61 @@
 import asyncio
 import logging
+import random
 import time
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Sequence
 import yfinance as yf
+from curl_cffi import requests as curl_requests
 
 logger = logging.getLogger(__name__)
 
+# Dedicated executor for yfinance downloads so a rates refresh doesn't queue behind other
+# blocking work (e.g. DNS lookups) in the loop's default executor. RatesService._lock only
+# serializes the awaits: when FETCH_TIMEOUT fires, the executor thread keeps running the
+# download. The second worker lets the next refresh start while a stalled one winds down
+# (bounded by YF_REQUEST_TIMEOUT) instead of spending its own timeout in the queue.
+RATES_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rates")
+
 class RatesService:
-    _instance = None
+    """
+    Fetches and caches exchange rates. Use the module-level `rates_service` instance:
+    every RatesService() is a separate object with its own cache and lock.
+    """
 
     # Cache configuration
     CACHE_TTL = 3600  # 1 hour
     FETCH_TIMEOUT = 30  # 30 seconds timeout for API calls
+    YF_REQUEST_TIMEOUT = 10  # per-request HTTP timeout inside yf.download, well below FETCH_TIMEOUT
+    REFRESH_MARGIN = 60  # refresh_loop renews rates this long before they expire
+    REFRESH_RETRY = 60  # refresh_loop retry delay after a failed fetch
+    MAX_CONSECUTIVE_FAILURES = 3
+
+    def __init__(self):
+        self.rates: Dict[str, float] = {}
+        self.base_currency = "USD"
+        self.last_updated = 0.0
+        self._lock = asyncio.Lock()
+        self._consecutive_failures = 0
+        self._last_attempt = 0.0  # when the last fetch attempt (successful or not) finished
+        self._backoff_until = 0.0  # get_rates() skips fetching until then after repeated failures
+        self._yf_session: Optional[curl_requests.Session] = None
+        # No API key needed for yfinance
+
+    def _get_yf_session(self) -> curl_requests.Session:
+        """
+        Returns the HTTP session used for Yahoo Finance requests, created on first use.
+        OPTIMIZATION: Without an explicit session yf.download builds a new one per call, so every
+        hourly refresh paid for fresh TLS connections and a new Yahoo cookie/crumb handshake.
+        """
+        if self._yf_session is None:
+            self._yf_session = curl_requests.Session(impersonate="chrome")
+        return self._yf_session
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance.rates = {}
-            cls._instance.base_currency = "USD"
-            cls._instance.last_updated = 0.0
-            cls._instance._lock = asyncio.Lock()
-            cls._instance._consecutive_failures = 0
-            cls._instance.MAX_CONSECUTIVE_FAILURES = 3
-            # No API key needed for yfinance
-
-        return cls._instance
+    def close(self):
+        """Closes the Yahoo Finance HTTP session (called on shutdown)."""
+        if self._yf_session is not None:
+            self._yf_session.close()
+            self._yf_session = None
 
     async def _fetch_rates(self) -> Optional[Dict[str, float]]:
         """
@@ -57,18 +88,26 @@ class RatesService:
 
         try:
             loop = asyncio.get_running_loop()
+            session = self._get_yf_session()
 
             def fetch_sync():
                 # Fetch data for 5 days to avoid empty values on weekends/holidays
-                data = yf.download(tickers_list, period="5d", group_by='ticker', progress=False)
+                # OPTIMIZATION: Only the raw daily Close is read, so skip yfinance's price adjustment
+                # (auto_adjust=False also silences its per-call FutureWarning). threads=True keeps the
+                # per-ticker requests concurrent.
+                data = yf.download(
+                    tickers_list, period="5d", interval="1d", group_by='ticker', progress=False,
+                    threads=True, auto_adjust=False, prepost=False, timeout=self.YF_REQUEST_TIMEOUT,
+                    session=session
+                )
                 return data
 
             # Add timeout to prevent hanging on slow API responses
+            # OPTIMIZATION: asyncio.timeout() cancels the current task in place, while wait_for
+            # wraps the executor future in an extra Task.
             try:
-                data = await asyncio.wait_for(
-                    loop.run_in_executor(None, fetch_sync),
-                    timeout=self.FETCH_TIMEOUT
-                )
+                async with asyncio.timeout(self.FETCH_TIMEOUT):
+                    data = await loop.run_in_executor(RATES_POOL, fetch_sync)
             except asyncio.TimeoutError:
                 logger.error(f"Timeout ({self.FETCH_TIMEOUT}s) fetching rates from yfinance")
                 self._consecutive_failures += 1
@@ -119,6 +158,18 @@ class RatesService:
             self._consecutive_failures += 1
             return None
 
+    def _schedule_backoff(self):
+        """
+        After MAX_CONSECUTIVE_FAILURES failed fetches, sets the time until which get_rates()
+        serves stale rates: 60s doubling per further failure, capped at an hour.
+        The window is jittered by ±50% so that several bot instances hitting the same outage
+        don't retry Yahoo in lockstep; it is rolled once per failure, not per caller.
+        """
+        if self._consecutive_failures < self.MAX_CONSECUTIVE_FAILURES:
+            return
+        base = 60 * (2 ** (self._consecutive_failures - self.MAX_CONSECUTIVE_FAILURES))
+        self._backoff_until = self._last_attempt + min(3600, base * random.uniform(0.5, 1.5))
+
     async def get_rates(self) -> Dict[str, float]:
         """
         Returns rates, updating from API if cache is stale.
@@ -132,28 +183,71 @@ class RatesService:
         now = time.time()
         
         # Implement exponential backoff on consecutive failures
-        if self._consecutive_failures >= self.MAX_CONSECUTIVE_FAILURES:
-            backoff_time = min(3600, 60 * (2 ** (self._consecutive_failures - self.MAX_CONSECUTIVE_FAILURES)))
-            if now - self.last_updated < backoff_time:
-                logger.warning(f"Skipping rate update due to consecutive failures (backoff: {backoff_time}s)")
-                return self.rates
+        if self._consecutive_failures >= self.MAX_CONSECUTIVE_FAILURES and now < self._backoff_until:
+            logger.warning(f"Skipping rate update due to consecutive failures (backoff: {self._backoff_until - now:.0f}s left)")
+            return self.rates
         
         if not self.rates or (now - self.last_updated > self.CACHE_TTL):
             # Use lock to prevent multiple concurrent API calls (cache stampede)
             async with self._lock:
+                # OPTIMIZATION: A fetch that finished while we were waiting for the lock already
+                # answered this request, even if it failed. Without this check every queued caller
+                # retried a dead API back-to-back, each waiting up to FETCH_TIMEOUT.
+                if self._last_attempt >= now:
+                    return self.rates
+
                 # Double-check cache condition after acquiring lock
                 now = time.time()
                 if not self.rates or (now - self.last_updated > self.CACHE_TTL):
                     logger.info("Updating rates from yfinance...")
                     new_rates = await self._fetch_rates()
+                    self._last_attempt = time.time()
                     if new_rates:
                         self.rates = new_rates
                         self.last_updated = now
                     else:
                         logger.warning("Using stale rates due to API failure.")
+                        self._schedule_backoff()
 
         return self.rates
 
+    async def refresh(self) -> bool:
+        """
+        Fetches rates now, regardless of cache age. Returns False (keeping the old rates) on failure.
+        """
+        async with self._lock:
+            logger.info("Updating rates from yfinance...")
+            new_rates = await self._fetch_rates()
+            self._last_attempt = time.time()
+            if not new_rates:
+                logger.warning("Using stale rates due to API failure.")
+                self._schedule_backoff()
+                return False
+            self.rates = new_rates
+            self.last_updated = time.time()
+            return True
+
+    async def refresh_loop(self):
+        """
+        Background task that renews rates shortly before CACHE_TTL runs out.
+        OPTIMIZATION: Keeps get_rates() on its cache-hit path, so no user message has to wait
+        for a yfinance download when the hourly TTL expires.
+        """
+        while True:
+            try:
+                refreshed = await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Background rates refresh failed: {e}", exc_info=True)
+                refreshed = False
+            if refreshed:
+                delay = self.CACHE_TTL - self.REFRESH_MARGIN
+            else:
+                # Honour the jittered backoff from _schedule_backoff during longer outages
+                delay = max(self.REFRESH_RETRY, self._backoff_until - time.time())
+            await asyncio.sleep(delay)
+
     def calculate_conversion(self, amount: float, from_curr: str, to_curr: str, rates: Dict[str, float]) -> float:
         """
         Synchronous conversion logic using provided rates.
@@ -184,11 +278,50 @@ class RatesService:
 
         return amount * (rate_to / rate_from)
 
+    def get_conversion_factors(self, from_curr: str, to_currs: Sequence[str], rates: Dict[str, float]) -> Dict[str, float]:
+        """
+        Synchronous lookup of the multipliers from `from_curr` to each of `to_currs`.
+        The source rate is resolved once, so converting to T targets costs T multiplications
+        instead of T full `calculate_conversion` calls.
+        Unknown currencies map to 0.0, matching `calculate_conversion`.
+        """
+        from_curr = from_curr.upper()
+        rate_from = rates.get(from_curr)
+        if rate_from is None and from_curr == "USD":
+            rate_from = 1.0
+
+        if rate_from is None:
+            logger.warning(f"Currency {from_curr} not found in rates.")
+            return {to_curr: 0.0 for to_curr in to_currs}
+
+        # OPTIMIZATION: One reciprocal per source currency, then a multiplication per target.
+        # A zero source rate yields a zero reciprocal, so no per-target zero check is needed.
+        inv_from = 1.0 / rate_from if rate_from != 0.0 else 0.0
+
+        factors = {}
+        for to_curr in to_currs:
+            to_code = to_curr.upper()
+            rate_to = rates.get(to_code)
+            if rate_to is None and to_code == "USD":
+                rate_to = 1.0
+
+            if rate_to is None:
+                logger.warning(f"Currency {to_code} not found in rates.")
+                factors[to_curr] = 0.0
+            else:
+                factors[to_curr] = rate_to * inv_from
+
+        return factors
+
     async def convert(self, amount: float, from_curr: str, to_curr: str) -> float:
         """
         Converts amount from `from_curr` to `to_curr`.
         Returns 0.0 if conversion fails.
         """
+        # OPTIMIZATION: Same-currency conversion needs no rates, so don't wait for a refresh
+        if from_curr.upper() == to_curr.upper():
+            return float(amount)
+
         rates = await self.get_rates()
 
         if not rates:
@@ -197,4 +330,5 @@ class RatesService:
 
         return self.calculate_conversion(amount, from_curr, to_curr, rates)
 
+# Shared instance used by the bot, the inline mode and the background refresh loop
 rates_service = RatesService()
@@ -0,0 +1,166 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from src.services import charts
+from src.services.charts import ChartCache, generate_chart, generate_chart_async
+
+
+def test_chart_cache_returns_bytes_until_expired():
+    cache = ChartCache(ttl_seconds=300)
+    cache.set("RUB=X", "1mo", b"png")
+    assert cache.get("RUB=X", "1mo") == b"png"
+
+    expired = ChartCache(ttl_seconds=-1)
+    expired.set("RUB=X", "1mo", b"png")
+    assert expired.get("RUB=X", "1mo") is None
+
+
+def test_generate_chart_renders_once_then_hits_cache():
+    charts._chart_cache = ChartCache(ttl_seconds=300)
+    with patch("src.services.charts.render_chart", return_value=b"png") as mock_render:
+        first = generate_chart("EURRUB=X")
+        second = generate_chart("EURRUB=X")
+
+    assert first == b"png"
+    assert second == b"png"
+    mock_render.assert_called_once_with("EURRUB=X", "1mo")
+
+
+@pytest.mark.asyncio
+async def test_generate_chart_async_uses_pool_and_caches():
+    charts._chart_cache = ChartCache(ttl_seconds=300)
+    with ThreadPoolExecutor(max_workers=1) as pool, \
+         patch("src.services.charts.CHART_POOL", pool), \
+         patch("src.services.charts.render_chart", return_value=b"png") as mock_render:
+        first = await generate_chart_async("CNYRUB=X")
+        second = await generate_chart_async("CNYRUB=X")
+
+    assert first == b"png"
+    assert second == b"png"
+    mock_render.assert_called_once_with("CNYRUB=X", "1mo")
+
+
+@pytest.mark.asyncio
+async def test_generate_chart_async_returns_none_without_data():
+    charts._chart_cache = ChartCache(ttl_seconds=300)
+    with ThreadPoolExecutor(max_workers=1) as pool, \
+         patch("src.services.charts.CHART_POOL", pool), \
+         patch("src.services.charts.render_chart", return_value=None):
+        assert await generate_chart_async("XXXRUB=X") is None
+
+
+def _history(values):
+    import pandas as pd
+    index = pd.date_range("2026-09-01", periods=len(values), freq="D")
+    return pd.DataFrame({"Close": values}, index=index)
+
+
+def test_render_chart_is_deterministic_per_series():
+    from unittest.mock import MagicMock
+    from src.services.charts import render_chart
+
+    ticker = MagicMock()
+    with patch("src.services.charts.yf.Ticker", return_value=ticker):
+        ticker.history.return_value = _history([90.0, 91.5, 92.0, 91.0])
+        first = render_chart("RUB=X")
+
+        ticker.history.return_value = _history([1.0, 3.0, 2.0])
+        other = render_chart("CNYRUB=X")
+
+        ticker.history.return_value = _history([90.0, 91.5, 92.0, 91.0])
+        again = render_chart("RUB=X")
+
+    assert first.startswith(b"\x89PNG")
+    assert other != first
+    assert again == first
+
+
+def test_render_chart_returns_none_for_empty_history():
+    from unittest.mock import MagicMock
+    from src.services.charts import render_chart
+
+    ticker = MagicMock()
+    ticker.history.return_value = _history([])
+    with patch("src.services.charts.yf.Ticker", return_value=ticker):
+        assert render_chart("XXXRUB=X") is None
+
+
+def test_fetch_history_returns_arrays():
+    from unittest.mock import MagicMock
+
+    ticker = MagicMock()
+    ticker.history.return_value = _history([90.0, 91.0])
+    with patch("src.services.charts.yf.Ticker", return_value=ticker) as mock_ticker:
+        dates, values = charts._fetch_history("RUB=X", "1mo")
+
+    assert list(values) == [90.0, 91.0]
+    assert len(dates) == 2
+    mock_ticker.assert_called_once_with("RUB=X")
+
+
+def test_fetch_history_drops_missing_closes():
+    from unittest.mock import MagicMock
+    from src.services.charts import render_chart
+
+    ticker = MagicMock()
+    ticker.history.return_value = _history([90.0, float("nan"), 92.0, 91.0])
+    with patch("src.services.charts.yf.Ticker", return_value=ticker):
+        dates, values = charts._fetch_history("RUB=X", "1mo")
+        image = render_chart("RUB=X")
+
+    assert list(values) == [90.0, 92.0, 91.0]
+    assert len(dates) == 3
+    assert image.startswith(b"\x89PNG")
+
+    ticker.history.return_value = _history([float("nan"), float("nan")])
+    with patch("src.services.charts.yf.Ticker", return_value=ticker):
+        assert charts._fetch_history("RUB=X", "1mo") is None
+        assert render_chart("RUB=X") is None
+
+
+@pytest.mark.asyncio
+async def test_refresh_chart_replaces_cached_chart():
+    charts._chart_cache = ChartCache(ttl_seconds=300)
+    charts._chart_cache.set("RUB=X", "1mo", b"old")
+    with ThreadPoolExecutor(max_workers=1) as pool, \
+         patch("src.services.charts.CHART_POOL", pool), \
+         patch("src.services.charts.render_chart", side_effect=[b"new", None]):
+        assert await charts.refresh_chart("RUB=X") is True
+        assert charts._chart_cache.get("RUB=X", "1mo") == b"new"
+
+        # No data: keep serving the previous chart
+        assert await charts.refresh_chart("RUB=X") is False
+        assert charts._chart_cache.get("RUB=X", "1mo") == b"new"
+
+
+def test_render_chart_handles_flat_series():
+    from unittest.mock import MagicMock
+    from src.services.charts import render_chart
+
+    ticker = MagicMock()
+    ticker.history.return_value = _history([90.0])
+    with patch("src.services.charts.yf.Ticker", return_value=ticker):
+        image = render_chart("RUB=X", "1d")
+
+    assert image.startswith(b"\x89PNG")
+
+
+def test_chart_cache_evicts_expired_entry():
+    cache = ChartCache(ttl_seconds=300)
+    cache._cache[("RUB=X", "1mo")] = (0.0, b"old")
+
+    assert cache.get("RUB=X", "1mo") is None
+    assert ("RUB=X", "1mo") not in cache._cache
+
+
+def test_chart_cache_evicts_oldest_beyond_maxsize():
+    cache = ChartCache(ttl_seconds=300, maxsize=2)
+    cache.set("RUB=X", "1mo", b"usd")
+    cache.set("EURRUB=X", "1mo", b"eur")
+    cache.set("RUB=X", "1mo", b"usd2")  # refresh moves it to the end
+    cache.set("CNYRUB=X", "1mo", b"cny")
+
+    assert cache.get("EURRUB=X", "1mo") is None
+    assert cache.get("RUB=X", "1mo") == b"usd2"
+    assert cache.get("CNYRUB=X", "1mo") == b"cny"
@@ -0,0 +1,15 @@
+from unittest.mock import patch
+
+from src.config import get_settings
+
+
+def test_get_settings_is_cached():
+    get_settings.cache_clear()
+    with patch.dict("os.environ", {"BOT_TOKEN": "token", "OER_API_KEY": "key", "DB_PATH": "test.sqlite3"}):
+        first = get_settings()
+        second = get_settings()
+
+    assert first is second
+    assert first.DB_PATH == "test.sqlite3"
+    assert first.BOT_TOKEN.get_secret_value() == "token"
+    get_settings.cache_clear()
@@ -0,0 +1,70 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src.bot.handlers import convert_prices
+from src.services.rates import rates_service
+from src.services.recognizer import Price
+
+RATES = {"USD": 1.0, "RUB": 90.0, "EUR": 0.9}
+
+
+@pytest.mark.asyncio
+async def test_convert_prices_formats_targets():
+    with patch("src.bot.handlers.get_target_currencies", new_callable=AsyncMock) as mock_targets, \
+         patch("src.bot.handlers.rates_service.get_rates", new_callable=AsyncMock) as mock_rates:
+        mock_targets.return_value = ("USD", "RUB", "EUR")
+        mock_rates.return_value = RATES
+
+        response = await convert_prices([Price(amount=100.0, currency="USD")], AsyncMock(), 1)
+
+    assert response == "🇺🇸 100 USD\n  🇷🇺 9000 RUB\n  🇪🇺 90 EUR"
+    mock_rates.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_convert_prices_no_targets():
+    with patch("src.bot.handlers.get_target_currencies", new_callable=AsyncMock) as mock_targets, \
+         patch("src.bot.handlers.rates_service.get_rates", new_callable=AsyncMock) as mock_rates:
+        mock_targets.return_value = ()
+        mock_rates.return_value = RATES
+
+        response = await convert_prices([Price(amount=100.0, currency="USD")], AsyncMock(), 1)
+
+    assert response is None
+
+
+@pytest.mark.asyncio
+async def test_convert_prices_no_rates():
+    with patch("src.bot.handlers.get_target_currencies", new_callable=AsyncMock) as mock_targets, \
+         patch("src.bot.handlers.rates_service.get_rates", new_callable=AsyncMock) as mock_rates:
+        mock_targets.return_value = ("USD", "RUB")
+        mock_rates.return_value = {}
+
+        response = await convert_prices([Price(amount=100.0, currency="USD")], AsyncMock(), 1)
+
+    assert response is None
+
+
+@pytest.mark.asyncio
+async def test_convert_prices_repeats_duplicate_prices_in_order():
+    with patch("src.bot.handlers.get_target_currencies", new_callable=AsyncMock) as mock_targets, \
+         patch("src.bot.handlers.rates_service.get_rates", new_callable=AsyncMock) as mock_rates, \
+         patch("src.bot.handlers.rates_service.get_conversion_factors",
+               wraps=rates_service.get_conversion_factors) as mock_factors:
+        mock_targets.return_value = ("RUB",)
+        mock_rates.return_value = RATES
+
+        prices = [
+            Price(amount=100.0, currency="USD"),
+            Price(amount=90.0, currency="EUR"),
+            Price(amount=100.0, currency="USD"),
+        ]
+        response = await convert_prices(prices, AsyncMock(), 1)
+
+    assert response == (
+        "🇺🇸 100 USD\n  🇷🇺 9000 RUB\n\n"
+        "🇪🇺 90 EUR\n  🇷🇺 9000 RUB\n\n"
+        "🇺🇸 100 USD\n  🇷🇺 9000 RUB"
+    )
+    # One factor row per distinct source currency
+    assert mock_factors.call_count == 2
@@ -70,3 +70,116 @@ async def test_toggle_currency_updates_cache():
         assert isinstance(cached_data, tuple)
         assert "EUR" in cached_data
         assert "USD" in cached_data
+
+@pytest.mark.asyncio
+async def test_toggle_currency_single_update_on_cache_hit():
+    chat_id = 24680
+    mock_session = AsyncMock()
+
+    with patch("src.database.dal.get_chat_settings", new_callable=AsyncMock) as mock_get_settings:
+        import time
+        _settings_cache[chat_id] = (time.time(), ("USD", "EUR"))
+
+        result = await toggle_currency(mock_session, chat_id, "EUR")
+
+        assert result == ["USD"]
+        # Current list comes from cache, write is a single UPDATE
+        mock_get_settings.assert_not_called()
+        assert mock_session.execute.await_count == 1
+        mock_session.commit.assert_awaited_once()
+        assert _settings_cache[chat_id][1] == ("USD",)
+
+@pytest.mark.asyncio
+async def test_get_chat_settings_populates_cache():
+    from src.database.dal import get_chat_settings
+
+    chat_id = 13579
+    _settings_cache.pop(chat_id, None)
+
+    mock_settings = MagicMock()
+    mock_settings.target_currencies = ["RUB", "BTC"]
+    mock_result = MagicMock()
+    mock_result.scalar_one_or_none.return_value = mock_settings
+    mock_session = AsyncMock()
+    mock_session.execute.return_value = mock_result
+
+    settings = await get_chat_settings(mock_session, chat_id)
+    assert settings is mock_settings
+    assert _settings_cache[chat_id][1] == ("RUB", "BTC")
+
+    # Subsequent reads are served from the cache
+    currencies = await get_target_currencies(mock_session, chat_id)
+    assert currencies == ("RUB", "BTC")
+    assert mock_session.execute.await_count == 1
+
+@pytest.mark.asyncio
+async def test_get_chat_settings_inserts_defaults_with_returning():
+    from src.database.dal import get_chat_settings
+
+    chat_id = 11223
+    created = MagicMock()
+    created.target_currencies = ["USD", "EUR", "RUB"]
+
+    select_result = MagicMock()
+    select_result.scalar_one_or_none.return_value = None
+    insert_result = MagicMock()
+    insert_result.scalar_one_or_none.return_value = created
+
+    mock_session = AsyncMock()
+    mock_session.add = MagicMock()
+    mock_session.execute.side_effect = [select_result, insert_result]
+
+    settings = await get_chat_settings(mock_session, chat_id)
+
+    assert settings is created
+    # SELECT + INSERT ... RETURNING, no add()/refresh() round-trips
+    assert mock_session.execute.await_count == 2
+    mock_session.add.assert_not_called()
+    mock_session.commit.assert_awaited_once()
+    mock_session.refresh.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_get_chat_settings_reselects_after_insert_conflict():
+    from src.database.dal import get_chat_settings
+
+    existing = MagicMock()
+    existing.target_currencies = ["EUR"]
+
+    missing_result = MagicMock()
+    missing_result.scalar_one_or_none.return_value = None
+    reselect_result = MagicMock()
+    reselect_result.scalar_one.return_value = existing
+
+    mock_session = AsyncMock()
+    mock_session.execute.side_effect = [missing_result, missing_result, reselect_result]
+
+    settings = await get_chat_settings(mock_session, 44556)
+
+    assert settings is existing
+    assert mock_session.execute.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_toggle_round_trip_on_sqlite():
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from src.database.models import Base
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    _settings_cache.clear()
+    try:
+        async with session_factory() as session:
+            assert await toggle_currency(session, 7, "BTC") == ["USD", "EUR", "RUB", "BTC"]
+            assert await toggle_currency(session, 7, "USD") == ["EUR", "RUB", "BTC"]
+
+        # Bypass the cache to check what was persisted
+        _settings_cache.clear()
+        async with session_factory() as session:
+            assert await get_target_currencies(session, 7) == ("EUR", "RUB", "BTC")
+    finally:
+        _settings_cache.clear()
+        await engine.dispose()
@@ -0,0 +1,62 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from aiogram.exceptions import TelegramBadRequest
+
+from src.bot.handlers import on_toggle_currency
+from src.bot.keyboards import settings_keyboard
+
+
+def _callback(data, current_markup):
+    callback = MagicMock()
+    callback.data = data
+    callback.message.chat.id = 1
+    callback.message.reply_markup = current_markup
+    callback.message.edit_reply_markup = AsyncMock()
+    callback.answer = AsyncMock()
+    return callback
+
+
+@pytest.mark.asyncio
+async def test_toggle_edits_markup_when_changed():
+    callback = _callback("toggle_EUR", settings_keyboard(1, ["USD"]))
+
+    with patch("src.bot.handlers.get_target_currencies", new_callable=AsyncMock) as mock_targets, \
+         patch("src.bot.handlers.toggle_currency", new_callable=AsyncMock) as mock_toggle:
+        mock_targets.return_value = ("USD",)
+        mock_toggle.return_value = ["USD", "EUR"]
+        await on_toggle_currency(callback, AsyncMock())
+
+    callback.message.edit_reply_markup.assert_awaited_once()
+    callback.answer.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_toggle_ignores_not_modified_error():
+    callback = _callback("toggle_EUR", settings_keyboard(1, ["USD", "EUR"]))
+    callback.message.edit_reply_markup.side_effect = TelegramBadRequest(
+        method=MagicMock(), message="Bad Request: message is not modified"
+    )
+
+    with patch("src.bot.handlers.get_target_currencies", new_callable=AsyncMock) as mock_targets, \
+         patch("src.bot.handlers.toggle_currency", new_callable=AsyncMock) as mock_toggle:
+        mock_targets.return_value = ("USD",)
+        mock_toggle.return_value = ["USD", "EUR"]
+        await on_toggle_currency(callback, AsyncMock())
+
+    # The stale snapshot isn't trusted: the edit is always attempted
+    callback.message.edit_reply_markup.assert_awaited_once()
+    callback.answer.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_toggle_refuses_last_currency():
+    callback = _callback("toggle_USD", settings_keyboard(1, ["USD"]))
+
+    with patch("src.bot.handlers.get_target_currencies", new_callable=AsyncMock) as mock_targets, \
+         patch("src.bot.handlers.toggle_currency", new_callable=AsyncMock) as mock_toggle:
+        mock_targets.return_value = ("USD",)
+        await on_toggle_currency(callback, AsyncMock())
+
+    mock_toggle.assert_not_awaited()
+    callback.message.edit_reply_markup.assert_not_awaited()
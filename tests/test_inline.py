@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.bot.inline import build_inline_results, inline_query_handler
+from src.services.rates import rates_service
+from src.services.recognizer import recognize
+
+
+def _prices(text):
+    return tuple(recognize(text))
+
+
+def _set_rates(epoch):
+    rates_service.rates = {"USD": 1.0, "RUB": 90.0, "EUR": 0.9}
+    rates_service.last_updated = epoch
+
+
+def test_build_inline_results_converts_to_default_targets():
+    _set_rates(9999999999)
+    build_inline_results.cache_clear()
+
+    results = build_inline_results(_prices("100 usd"), rates_service.last_updated)
+
+    titles = [r.title for r in results]
+    assert titles == ["🇺🇸 100 USD ≈ 🇷🇺 9000 RUB", "🇺🇸 100 USD ≈ 🇪🇺 90 EUR"]
+
+
+def test_build_inline_results_is_memoized_per_rates_epoch():
+    _set_rates(9999999999)
+    build_inline_results.cache_clear()
+
+    first = build_inline_results(_prices("100 usd"), 9999999999)
+    second = build_inline_results(_prices("100 usd"), 9999999999)
+    assert first is second
+
+    refreshed = build_inline_results(_prices("100 usd"), 9999999999 + 1)
+    assert refreshed is not first
+
+
+@pytest.mark.asyncio
+async def test_inline_query_handler_answers_with_results():
+    _set_rates(9999999999)
+    build_inline_results.cache_clear()
+
+    inline_query = MagicMock()
+    inline_query.query = " 100 USD "
+    inline_query.answer = AsyncMock()
+
+    with patch("src.bot.inline.rates_service.get_rates", new_callable=AsyncMock) as mock_rates:
+        mock_rates.return_value = rates_service.rates
+        await inline_query_handler(inline_query)
+
+    inline_query.answer.assert_awaited_once()
+    results = inline_query.answer.call_args[0][0]
+    assert len(results) == 2
+
+
+@pytest.mark.asyncio
+async def test_inline_query_handler_recognizes_once():
+    _set_rates(9999999999)
+    build_inline_results.cache_clear()
+
+    inline_query = MagicMock()
+    inline_query.query = "100 usd"
+    inline_query.answer = AsyncMock()
+
+    with patch("src.bot.inline.rates_service.get_rates", new_callable=AsyncMock) as mock_rates, \
+         patch("src.bot.inline.recognize", wraps=recognize) as mock_recognize:
+        mock_rates.return_value = rates_service.rates
+        await inline_query_handler(inline_query)
+
+    mock_recognize.assert_called_once_with("100 usd")
+    assert len(inline_query.answer.call_args[0][0]) == 2
+
+
+def test_build_inline_results_ids_are_short_and_unique():
+    _set_rates(9999999999)
+    build_inline_results.cache_clear()
+
+    results = build_inline_results(_prices("100 usd 5 eur"), rates_service.last_updated)
+
+    ids = [r.id for r in results]
+    assert len(ids) == len(set(ids))
+    assert all(len(result_id) == 16 for result_id in ids)
+
+
+@pytest.mark.asyncio
+async def test_inline_query_handler_gives_up_on_slow_rates():
+    inline_query = MagicMock()
+    inline_query.query = "100 USD"
+    inline_query.answer = AsyncMock()
+
+    async def slow_rates():
+        await asyncio.sleep(1)
+        return rates_service.rates
+
+    with patch("src.bot.inline.rates_service.get_rates", side_effect=slow_rates), \
+         patch("src.bot.inline.INLINE_RATES_TIMEOUT", 0.01):
+        await inline_query_handler(inline_query)
+
+    inline_query.answer.assert_not_awaited()
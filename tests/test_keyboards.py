@@ -0,0 +1,42 @@
+from src.bot.keyboards import format_converted_amount, settings_keyboard
+
+
+def test_format_converted_amount_strips_trailing_zeros():
+    assert format_converted_amount(100.0, 90.0) == "9000"
+    assert format_converted_amount(1.0, 1.5) == "1.5"
+    assert format_converted_amount(1.0, 0.123) == "0.12"
+
+
+def test_format_converted_amount_is_memoized():
+    format_converted_amount.cache_clear()
+    format_converted_amount(100.0, 90.0)
+    format_converted_amount(100.0, 90.0)
+    info = format_converted_amount.cache_info()
+    assert info.hits == 1
+    assert info.misses == 1
+
+
+def test_format_converted_amount_whole_and_non_finite_values():
+    assert format_converted_amount(3.0, 1.0) == "3"
+    assert format_converted_amount(0.0, 90.0) == "0"
+    assert format_converted_amount(2.999, 1.0) == "3"
+    assert format_converted_amount(float("inf"), 1.0) == "inf"
+
+
+def test_settings_keyboard_marks_active_currencies():
+    markup = settings_keyboard(1, ["USD", "EUR"])
+
+    buttons = [button for row in markup.inline_keyboard for button in row]
+    texts = {button.callback_data: button.text for button in buttons}
+    assert texts["toggle_USD"] == "✅ 🇺🇸 USD"
+    assert texts["toggle_RUB"] == "❌ 🇷🇺 RUB"
+    assert buttons[-1].callback_data == "close_settings"
+
+
+def test_settings_keyboard_is_shared_across_chats_and_orders():
+    assert settings_keyboard(1, ["USD", "EUR"]) is settings_keyboard(2, ("EUR", "USD"))
+    assert settings_keyboard(1, ["USD"]) is not settings_keyboard(1, ["EUR"])
+
+
+def test_settings_keyboard_ignores_codes_without_buttons():
+    assert settings_keyboard(1, ["USD", "JPY"]) is settings_keyboard(1, ["USD"])
@@ -0,0 +1,41 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from aiogram.dispatcher.event.handler import HandlerObject
+
+from src.config import get_settings
+
+
+async def _needs_session(message, session):
+    pass
+
+
+async def _no_session(message):
+    pass
+
+
+@pytest.mark.asyncio
+async def test_opens_session_only_for_handlers_that_take_it():
+    # The engine module reads settings at import time
+    get_settings.cache_clear()
+    with patch.dict("os.environ", {"BOT_TOKEN": "token", "OER_API_KEY": "key", "DB_PATH": "test.sqlite3"}):
+        from src.bot.middlewares import DbSessionMiddleware
+    get_settings.cache_clear()
+
+    middleware = DbSessionMiddleware()
+    handler = AsyncMock(return_value="ok")
+    session = MagicMock()
+    session_cm = MagicMock()
+    session_cm.__aenter__ = AsyncMock(return_value=session)
+    session_cm.__aexit__ = AsyncMock(return_value=False)
+
+    with patch("src.bot.middlewares.async_session", return_value=session_cm) as mock_factory:
+        data = {"handler": HandlerObject(callback=_no_session)}
+        assert await middleware(handler, MagicMock(), data) == "ok"
+        assert "session" not in data
+        mock_factory.assert_not_called()
+
+        data = {"handler": HandlerObject(callback=_needs_session)}
+        assert await middleware(handler, MagicMock(), data) == "ok"
+        assert data["session"] is session
+        mock_factory.assert_called_once()
@@ -1,9 +1,19 @@
+import pytest
 from unittest.mock import patch
 from PIL import Image
 import io
+from src.services import ocr
 from src.services.ocr import image_to_text
 
 
+@pytest.fixture(autouse=True)
+def clear_ocr_cache():
+    """Tests reuse identical images, so start each one with an empty OCR cache"""
+    ocr._ocr_cache.clear()
+    yield
+    ocr._ocr_cache.clear()
+
+
 def create_test_image(width=100, height=100, mode='RGB', color=(255, 255, 255)):
     """Helper to create a test image"""
     img = Image.new(mode, (width, height), color)
@@ -85,3 +95,58 @@ def test_image_to_text_invalid_image_data():
     
     result = image_to_text(invalid_bytes)
     assert result is None
+
+
+def test_image_to_text_caps_upscaled_width():
+    """Test that upscaling small images stops at MAX_UPSCALED_WIDTH"""
+    from src.services.ocr import MAX_UPSCALED_WIDTH
+
+    with patch('pytesseract.image_to_string', return_value='Text') as mock_ocr:
+        image_to_text(create_test_image(width=900, height=300))
+        assert mock_ocr.call_args[0][0].size == (MAX_UPSCALED_WIDTH, 500)
+
+        image_to_text(create_test_image(width=300, height=200))
+        assert mock_ocr.call_args[0][0].size == (900, 600)
+
+
+def test_image_to_text_caches_by_content():
+    """Test that the same image bytes are OCRed once, failures are retried"""
+    image_bytes = create_test_image()
+
+    with patch('pytesseract.image_to_string', side_effect=[Exception("OCR Error"), 'Text']) as mock_ocr:
+        assert image_to_text(image_bytes) is None
+        assert image_to_text(image_bytes) == 'Text'
+        assert image_to_text(io.BytesIO(image_bytes)) == 'Text'
+
+    assert mock_ocr.call_count == 2
+
+
+def test_mean_brightness_matches_imagestat():
+    """Test the numpy brightness against Pillow's ImageStat"""
+    from PIL import ImageStat
+    from src.services.ocr import _mean_brightness
+
+    image = Image.new('L', (100, 100), 30)
+    image.paste(220, (0, 0, 100, 40))
+
+    assert _mean_brightness(image) == ImageStat.Stat(image).mean[0]
+
+
+def test_sharpen_kernel_matches_image_enhance():
+    """Test that the folded kernel reproduces ImageEnhance.Sharpness(2.0)"""
+    from PIL import ImageEnhance
+    from src.services.ocr import SHARPEN_2X
+
+    image = Image.effect_noise((64, 48), 60)
+
+    assert image.filter(SHARPEN_2X).tobytes() == ImageEnhance.Sharpness(image).enhance(2.0).tobytes()
+
+
+def test_warm_up_ocr_swallows_errors():
+    """Test that a failing warm-up (e.g. tesseract missing) doesn't raise"""
+    from src.services.ocr import warm_up_ocr
+
+    with patch('pytesseract.image_to_string', side_effect=Exception("tesseract not found")) as mock_ocr:
+        warm_up_ocr()
+
+    mock_ocr.assert_called_once()
@@ -77,6 +77,34 @@ class TestOCRFastAutocontrast(unittest.TestCase):
         # Should return original image without calling point()
         self.assertEqual(result, mock_image)
         mock_image.point.assert_not_called()
+    def test_fast_autocontrast_folds_contrast_boost(self):
+        """
+        Test that contrast=1.5 gives the same result as a separate ImageEnhance.Contrast pass.
+        """
+        from PIL import ImageEnhance
+
+        image = Image.new("L", (20, 10), 90)
+        image.paste(170, (0, 0, 10, 10))
+        thumb = image.copy()
+
+        fused = _fast_autocontrast(image, thumb, cutoff=2, contrast=1.5)
+        separate = ImageEnhance.Contrast(_fast_autocontrast(image, thumb, cutoff=2)).enhance(1.5)
+
+        self.assertEqual(list(fused.getdata()), list(separate.getdata()))
+    def test_fast_autocontrast_folds_inversion(self):
+        """
+        Test that invert=True matches ImageOps.invert followed by the same autocontrast.
+        """
+        from PIL import ImageOps
+
+        image = Image.new("L", (20, 10), 30)
+        image.paste(120, (0, 0, 10, 10))
+        thumb = image.copy()
+
+        fused = _fast_autocontrast(image, thumb, cutoff=2, contrast=1.5, invert=True)
+        separate = _fast_autocontrast(ImageOps.invert(image), ImageOps.invert(thumb), cutoff=2, contrast=1.5)
+
+        self.assertEqual(list(fused.getdata()), list(separate.getdata()))
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,11 +1,13 @@
 import unittest
 from unittest.mock import MagicMock, patch
+from src.services import ocr
 from src.services.ocr import image_to_text
 
 class TestOCROptimization(unittest.TestCase):
     def setUp(self):
         # Create a dummy image bytes
         self.image_bytes = b"fake_image_data"
+        ocr._ocr_cache.clear()
 
     @patch("src.services.ocr.Image.open")
     @patch("src.services.ocr.pytesseract.image_to_string")
@@ -27,15 +29,14 @@ class TestOCROptimization(unittest.TestCase):
         # Mock getbbox for ImageStat internal checks or similar if needed,
         # but ImageStat(thumb) mainly needs histogram or pixel access.
         # Actually ImageStat.Stat(image) calls image.histogram() or uses pixel access.
-        # Let's mock ImageStat.Stat as well to avoid deep PIL mocking.
+        # Let's mock _mean_brightness as well to avoid deep PIL mocking.
 
         mock_image.resize.return_value = mock_resized
 
         mock_open.return_value = mock_image
         mock_ocr.return_value = "text"
 
-        with patch("src.services.ocr.ImageStat.Stat") as mock_stat:
-            mock_stat.return_value.mean = [200] # Light image
+        with patch("src.services.ocr._mean_brightness", return_value=200): # Light image
 
             # Run function
             image_to_text(self.image_bytes)
@@ -67,8 +68,7 @@ class TestOCROptimization(unittest.TestCase):
         mock_open.return_value = mock_image
         mock_ocr.return_value = "text"
 
-        with patch("src.services.ocr.ImageStat.Stat") as mock_stat:
-            mock_stat.return_value.mean = [200]
+        with patch("src.services.ocr._mean_brightness", return_value=200):
 
             image_to_text(self.image_bytes)
 
@@ -1,14 +1,24 @@
+import asyncio
+import threading
+import time
 import pytest
 from unittest.mock import patch
-from src.services.rates import RatesService
+from src.services.rates import RatesService, rates_service
 
 
 @pytest.mark.asyncio
-async def test_rates_service_singleton():
-    """Test that RatesService is a singleton"""
-    service1 = RatesService()
-    service2 = RatesService()
-    assert service1 is service2
+async def test_new_instance_does_not_touch_shared_service():
+    """Test that constructing RatesService() leaves the shared rates_service cache alone"""
+    rates_service.rates = {"USD": 1.0, "RUB": 90.0}
+    rates_service.last_updated = 9999999999
+
+    service = RatesService()
+    assert service is not rates_service
+    assert service.rates == {}
+    assert rates_service.rates == {"USD": 1.0, "RUB": 90.0}
+
+    rates_service.rates = {}
+    rates_service.last_updated = 0.0
 
 
 @pytest.mark.asyncio
@@ -23,6 +33,17 @@ async def test_convert_same_currency():
     assert result == 100.0
 
 
+@pytest.mark.asyncio
+async def test_convert_same_currency_skips_rates():
+    """Test that same-currency conversion returns without fetching rates"""
+    service = RatesService()
+
+    with patch.object(service, "get_rates") as mock_get_rates:
+        assert await service.convert(250, "rub", "RUB") == 250.0
+
+    mock_get_rates.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_convert_to_missing_currency():
     """Test conversion to unknown currency returns 0.0"""
@@ -84,3 +105,174 @@ async def test_convert_handles_no_rates():
     with patch.object(service, '_fetch_rates', return_value=None):
         result = await service.convert(100, "USD", "EUR")
         assert result == 0.0
+
+
+def test_get_conversion_factors():
+    """Test that conversion factors match calculate_conversion for each target"""
+    service = RatesService()
+    rates = {"USD": 1.0, "RUB": 90.0, "EUR": 0.9}
+
+    factors = service.get_conversion_factors("EUR", ["USD", "RUB", "FAKE"], rates)
+
+    assert abs(factors["USD"] - service.calculate_conversion(1.0, "EUR", "USD", rates)) < 1e-9
+    assert abs(factors["RUB"] - 100.0) < 1e-9
+    assert factors["FAKE"] == 0.0
+
+
+def test_get_conversion_factors_missing_source():
+    """Test that an unknown source currency yields zero factors"""
+    service = RatesService()
+    rates = {"USD": 1.0, "RUB": 90.0, "ZERO": 0.0}
+
+    assert service.get_conversion_factors("FAKE", ["USD", "RUB"], rates) == {"USD": 0.0, "RUB": 0.0}
+    assert service.get_conversion_factors("ZERO", ["USD"], rates) == {"USD": 0.0}
+
+
+@pytest.mark.asyncio
+async def test_fetch_rates_reuses_yahoo_session():
+    """Test that every yfinance download goes through the same HTTP session"""
+    service = RatesService()
+    service.close()
+
+    with patch("src.services.rates.curl_requests.Session") as mock_session_cls, \
+         patch("src.services.rates.yf.download", side_effect=Exception("offline")) as mock_download:
+        await service._fetch_rates()
+        await service._fetch_rates()
+
+    mock_session_cls.assert_called_once_with(impersonate="chrome")
+    sessions = [call.kwargs["session"] for call in mock_download.call_args_list]
+    assert sessions == [mock_session_cls.return_value] * 2
+    # Raw daily closes only: no price adjustment pass
+    assert mock_download.call_args.kwargs["auto_adjust"] is False
+    assert mock_download.call_args.kwargs["interval"] == "1d"
+    # The download itself gives up before the outer FETCH_TIMEOUT, freeing the pool thread
+    assert mock_download.call_args.kwargs["timeout"] < service.FETCH_TIMEOUT
+
+    service.close()
+    mock_session_cls.return_value.close.assert_called_once()
+    service._consecutive_failures = 0
+
+
+@pytest.mark.asyncio
+async def test_refresh_replaces_rates_even_when_fresh():
+    """Test that refresh() fetches regardless of cache age and keeps rates on failure"""
+    service = RatesService()
+    service.rates = {"USD": 1.0, "RUB": 90.0}
+    service.last_updated = 9999999999
+
+    with patch.object(service, "_fetch_rates", side_effect=[{"USD": 1.0, "RUB": 95.0}, None]):
+        assert await service.refresh() is True
+        assert service.rates["RUB"] == 95.0
+        refreshed_at = service.last_updated
+
+        assert await service.refresh() is False
+        assert service.rates["RUB"] == 95.0
+        assert service.last_updated == refreshed_at
+
+
+@pytest.mark.asyncio
+async def test_fetch_rates_timeout_counts_failure():
+    """Test that a download slower than FETCH_TIMEOUT returns None and counts as a failure"""
+    service = RatesService()
+    service._consecutive_failures = 0
+
+    with patch.object(RatesService, "FETCH_TIMEOUT", 0.01), \
+         patch("src.services.rates.curl_requests.Session"), \
+         patch("src.services.rates.yf.download", side_effect=lambda *a, **k: time.sleep(0.2)):
+        assert await service._fetch_rates() is None
+
+    assert service._consecutive_failures == 1
+    service.close()
+    service._consecutive_failures = 0
+
+
+@pytest.mark.asyncio
+async def test_get_rates_waiters_do_not_retry_failed_fetch():
+    """Test that callers queued behind a failed fetch reuse its outcome instead of refetching"""
+    service = RatesService()
+    calls = 0
+
+    async def failing_fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return None
+
+    with patch.object(service, "_fetch_rates", side_effect=failing_fetch):
+        results = await asyncio.gather(*(service.get_rates() for _ in range(5)))
+        assert calls == 1
+        assert results == [{}] * 5
+
+        # A later caller (after the failed attempt) tries again
+        await service.get_rates()
+        assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_get_rates_backoff_is_jittered_and_fixed_per_failure():
+    """Test that the backoff window is rolled once per failure and honoured by later callers"""
+    service = RatesService()
+    service._consecutive_failures = service.MAX_CONSECUTIVE_FAILURES - 1
+
+    async def failing_fetch():
+        service._consecutive_failures += 1
+        return None
+
+    with patch.object(service, "_fetch_rates", side_effect=failing_fetch) as mock_fetch, \
+         patch("src.services.rates.random.uniform", return_value=1.5) as mock_uniform:
+        await service.get_rates()
+        # 60s base for the first failure past the threshold, stretched by the jitter factor
+        assert service._backoff_until == pytest.approx(service._last_attempt + 90.0)
+
+        await service.get_rates()
+        await service.get_rates()
+
+    assert mock_fetch.call_count == 1
+    mock_uniform.assert_called_once_with(0.5, 1.5)
+
+
+@pytest.mark.asyncio
+async def test_fetch_rates_runs_in_dedicated_executor():
+    """Test that yf.download runs on the rates pool, not the loop's default executor"""
+    service = RatesService()
+    thread_names = []
+
+    def fake_download(*args, **kwargs):
+        thread_names.append(threading.current_thread().name)
+        raise Exception("offline")
+
+    with patch("src.services.rates.curl_requests.Session"), \
+         patch("src.services.rates.yf.download", side_effect=fake_download):
+        assert await service._fetch_rates() is None
+
+    assert thread_names[0].startswith("rates")
+    service.close()
+
+
+@pytest.mark.asyncio
+async def test_refresh_loop_waits_out_backoff_after_failure():
+    """Test that the background loop doesn't retry before the backoff deadline"""
+    service = RatesService()
+    service._backoff_until = time.time() + 600
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+        raise asyncio.CancelledError
+
+    with patch.object(service, "refresh", return_value=False), \
+         patch("src.services.rates.asyncio.sleep", side_effect=fake_sleep):
+        with pytest.raises(asyncio.CancelledError):
+            await service.refresh_loop()
+
+    assert 590 < delays[0] <= 600
+
+    # Without an active backoff the regular retry delay applies
+    service._backoff_until = 0.0
+    delays.clear()
+    with patch.object(service, "refresh", return_value=False), \
+         patch("src.services.rates.asyncio.sleep", side_effect=fake_sleep):
+        with pytest.raises(asyncio.CancelledError):
+            await service.refresh_loop()
+
+    assert delays == [service.REFRESH_RETRY]
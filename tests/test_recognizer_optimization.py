@@ -39,3 +39,44 @@ class TestRecognizerOptimization:
         # 1,5 rub -> 1.5
         assert results[2].amount == 1.5
         assert results[2].currency == "RUB"
+
+    def test_combined_pattern_named_groups(self):
+        # parse() unpacks match.groups() positionally, so the named groups must stay in this order
+        assert list(CurrencyRecognizer.COMBINED_PATTERN.groupindex) == [
+            "amount1", "mult1", "cur1", "cur2", "amount2", "mult2", "slang"
+        ]
+        assert CurrencyRecognizer.COMBINED_PATTERN.groups == 7
+
+    def test_tokens_table(self):
+        # Slang amounts carry their multiplier and imply RUB; currency words keep 1.0
+        assert CurrencyRecognizer.TOKENS["косарей"] == ("RUB", 1000.0, False)
+        assert CurrencyRecognizer.TOKENS["тонна"] == ("RUB", 1000.0, False)
+        assert CurrencyRecognizer.TOKENS["usd"] == ("USD", 1.0, False)
+        # Symbols are flagged for strict mode
+        assert CurrencyRecognizer.TOKENS["$"] == ("USD", 1.0, True)
+        # Every whitelisted currency token resolves through the table
+        assert set(CurrencyRecognizer._CURRENCY_TOKENS) == set(CurrencyRecognizer.TOKENS)
+        # Building the table leaves no loop variables on the class
+        assert not hasattr(CurrencyRecognizer, "token")
+        assert not hasattr(CurrencyRecognizer, "currency")
+        assert CurrencyRecognizer.parse("2к косаря") == CurrencyRecognizer.parse("2000000 руб")
+
+    def test_parse_is_memoized_for_short_text(self):
+        CurrencyRecognizer._parse_cached.cache_clear()
+        first = CurrencyRecognizer.parse("500 eur")
+        second = CurrencyRecognizer.parse("500 eur")
+        assert first == second
+        # Callers get their own list, so mutating one result can't poison the cache
+        assert first is not second
+        first.clear()
+        assert CurrencyRecognizer.parse("500 eur") == second
+        info = CurrencyRecognizer._parse_cached.cache_info()
+        assert (info.hits, info.misses) == (2, 1)
+        # strict_mode is part of the key
+        assert CurrencyRecognizer.parse("500 eur", strict_mode=True) == []
+
+    def test_parse_skips_cache_for_long_text(self):
+        CurrencyRecognizer._parse_cached.cache_clear()
+        text = "100 usd " + "x" * CurrencyRecognizer.PARSE_CACHE_MAX_LEN
+        assert CurrencyRecognizer.parse(text)[0].amount == 100.0
+        assert CurrencyRecognizer._parse_cached.cache_info().currsize == 0